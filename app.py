@@ -1,8 +1,14 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import polars as pl
 import plotly.express as px
+import plotly.graph_objects as go
+import io
 import os
+from collections import defaultdict
+from PIL import Image
+from st_aggrid import AgGrid, GridUpdateMode
 
 # ---------------- CONFIG PÁGINA ----------------
 st.set_page_config(
@@ -12,7 +18,8 @@ st.set_page_config(
 )
 
 # ---------------- CSS GLOBAL ----------------
-st.markdown("""
+# Se emite en cada rerun: Streamlit quita los elementos que un rerun no dibuja
+GLOBAL_CSS = """
 <style>
 
 [data-testid="stAppViewContainer"] {
@@ -46,9 +53,19 @@ label, .stSelectbox label, .stSlider label, .css-1n76uvr, .css-q8sbsg {
 }
 
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(GLOBAL_CSS, unsafe_allow_html=True)
 
 # ---------------- TÍTULO + LOGO ----------------
+@st.cache_resource
+def load_logo():
+    # Bytes PNG ya reducidos a 120 px: st.image no tiene que recodificar ni redimensionar
+    logo = Image.open("LOGO_NFL.png")
+    logo.thumbnail((120, 120))
+    buf = io.BytesIO()
+    logo.save(buf, format="PNG")
+    return buf.getvalue()
+
 col_title, col_logo = st.columns([0.85, 0.15])
 
 with col_title:
@@ -56,61 +73,189 @@ with col_title:
 
 with col_logo:
     try:
-        st.image("LOGO_NFL.png", width=120)
+        st.image(load_logo(), width=120)
     except Exception:
         pass
 
 # ---------------- CARGA DE DATOS ----------------
-@st.cache_data
+# cache_resource comparte los mismos objetos entre reruns y sesiones (cache_data
+# devolvería una copia deserializada cada vez): nada debe modificarlos in place.
+@st.cache_resource
 def load_data():
+    # El Parquet (ver convert_to_parquet.py) ya trae tipos y no hay que parsearlo.
+    # Solo se usa si no es más viejo que el CSV: un CSV actualizado tiene prioridad.
+    parquet_name = "NFL_scores.parquet"
     file_name = "NFL_scores.csv"
-    if not os.path.exists(file_name):
-        st.error(f"No se encontró '{file_name}'. Súbelo a Colab antes de continuar.")
+    csv_exists = os.path.exists(file_name)
+    if os.path.exists(parquet_name) and (
+        not csv_exists or os.path.getmtime(parquet_name) >= os.path.getmtime(file_name)
+    ):
+        lf = pl.scan_parquet(parquet_name)
+    elif csv_exists:
+        # "week" trae "Wildcard", "Division", ... después de la fila 100: se lee
+        # como texto y el cast no estricto de abajo lo convierte en nulo
+        lf = pl.scan_csv(file_name, schema_overrides={"week": pl.Utf8})
+    else:
+        st.error(f"No se encontró '{file_name}' ni '{parquet_name}'. Sube uno de los dos antes de continuar.")
         raise SystemExit("Archivo no encontrado")
 
-    df = pd.read_csv(file_name)
+    schema = lf.collect_schema()
+    columns = schema.names()
 
     required = [
         "score_home", "score_away", "season", "week",
         "over_under_line", "spread_favorite", "team_home", "team_away"
     ]
-    missing = [c for c in required if c not in df.columns]
+    missing = [c for c in required if c not in columns]
     if missing:
         st.error(f"Faltan columnas esenciales: {', '.join(missing)}")
         raise SystemExit("Columnas faltantes")
 
-    for c in ["season", "week", "score_home", "score_away",
-              "over_under_line", "spread_favorite"]:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
+    # Solo las columnas que usa la app, con el tipo más angosto que les cabe
+    optional = [c for c in ("schedule_date", "schedule_playoff", "stadium") if c in columns]
+    lf = lf.select(required + optional).with_columns(
+        pl.col(["season", "score_home", "score_away"]).cast(pl.Int16, strict=False),
+        pl.col("week").cast(pl.Int8, strict=False),
+        pl.col(["over_under_line", "spread_favorite"]).cast(pl.Float32, strict=False),
+    )
 
-    if "schedule_date" in df.columns:
-        df["schedule_date"] = pd.to_datetime(df["schedule_date"], errors="coerce")
-        df["Year"] = df["schedule_date"].dt.year
-        df["Month-Year"] = df["schedule_date"].dt.to_period("M").astype(str)
-        df["Week"] = df["schedule_date"].dt.isocalendar().week
+    if "schedule_date" in columns:
+        date = pl.col("schedule_date")
+        if schema["schedule_date"] == pl.Utf8:
+            # En el CSV vienen como M/D/YYYY; try_parse_dates las leería como D/M
+            date = date.str.to_date("%m/%d/%Y", strict=False)
+        calendar = [
+            date.alias("schedule_date"),
+            date.dt.year().alias("Year"),
+            date.dt.strftime("%Y-%m").alias("Month-Year"),
+            date.dt.week().alias("Week"),
+        ]
     else:
-        df["Year"] = df["season"]
-        df["Month-Year"] = df["season"].astype(str)
-        df["Week"] = df["week"]
-
-    df["total_points"] = df["score_home"] + df["score_away"]
-    df["margin_home"] = df["score_home"] - df["score_away"]
+        calendar = [
+            pl.col("season").alias("Year"),
+            pl.col("season").cast(pl.Utf8).alias("Month-Year"),
+            pl.col("week").alias("Week"),
+        ]
+
+    if "schedule_playoff" in columns:
+        if schema["schedule_playoff"] == pl.Boolean:
+            # True/False ya llega como booleano: no hace falta pasar por strings
+            playoff = pl.col("schedule_playoff").fill_null(False)
+        else:
+            playoff = pl.col("schedule_playoff").cast(pl.Utf8).str.to_lowercase().is_in(
+                ["1", "true", "yes", "y", "si", "sí"]
+            )
+        phase = pl.when(playoff).then(pl.lit("Playoffs")).otherwise(pl.lit("Regular"))
+    else:
+        phase = pl.lit("Regular")
 
-    if "schedule_playoff" in df.columns:
-        playoff = df["schedule_playoff"].astype(str).str.lower().isin(
-            ["1", "true", "yes", "y", "si", "sí"]
+    if "stadium" in columns:
+        stadium = pl.col("stadium").cast(pl.Utf8).fill_null("Unknown")
+    else:
+        stadium = pl.lit("Unknown")
+
+    lf = lf.with_columns([
+        *calendar,
+        (pl.col("score_home") + pl.col("score_away")).alias("total_points"),
+        (pl.col("score_home") - pl.col("score_away")).alias("margin_home"),
+        phase.alias("Phase"),
+        stadium.alias("stadium"),
+        pl.col("team_home").cast(pl.Utf8),
+        pl.col("team_away").cast(pl.Utf8),
+    ])
+
+    games = lf.collect()
+    df = games.to_pandas(use_pyarrow_extension_array=True)
+
+    # Local y visitante comparten dtype, así sus códigos son comparables
+    teams = pd.Index(df["team_home"].dropna().unique()).union(
+        pd.Index(df["team_away"].dropna().unique())
+    )
+    team_dtype = pd.CategoricalDtype(teams)
+    df["team_home"] = df["team_home"].astype(team_dtype)
+    df["team_away"] = df["team_away"].astype(team_dtype)
+    df["stadium"] = df["stadium"].astype("category")
+    df["Phase"] = df["Phase"].astype(pd.CategoricalDtype(["Playoffs", "Regular"]))
+
+    # Totales acumulados por temporada: cualquier rango del slider se
+    # resuelve restando dos filas en lugar de recorrer todos los partidos.
+    # Cada comparación se cuenta dentro del group_by, sin Series booleanas intermedias.
+    per_season = (
+        games.drop_nulls("season")
+        .group_by("season")
+        .agg(
+            pl.len().alias("games"),
+            pl.col("total_points").count().alias("scored"),
+            pl.col("total_points").sum().alias("pts"),
+            (pl.col("margin_home") > 0).sum().alias("hw"),
+            (pl.col("margin_home").abs() <= 3).sum().alias("cg"),
         )
-        df["Phase"] = np.where(playoff, "Playoffs", "Regular")
+        .sort("season")
+        .to_pandas()
+        .set_index("season")
+        .astype("float64")
+    )
+    season_cum = per_season.cumsum()
+
+    return df, season_cum, games
+
+# ---------------- AGREGACIONES CACHEADAS ----------------
+# El prefijo "_" evita que Streamlit hashee el DataFrame en cada rerun:
+# df sale de load_data() y no cambia durante la sesión.
+@st.cache_data
+def get_teams(_df):
+    return sorted(_df["team_home"].cat.categories.union(_df["team_away"].cat.categories))
+
+@st.cache_resource
+def h2h_index(_df):
+    # Filas de cada enfrentamiento, sin importar quién jugó de local
+    idx = defaultdict(list)
+    for i, (h, a) in enumerate(zip(_df["team_home"].to_numpy(), _df["team_away"].to_numpy())):
+        idx[frozenset((h, a))].append(i)
+    return {k: np.asarray(v, dtype=np.int32) for k, v in idx.items()}
+
+@st.cache_data
+def h2h_games(_df, team_a, team_b):
+    # Cacheado por par de equipos: los reruns reutilizan la misma tabla
+    rows = h2h_index(_df).get(frozenset((team_a, team_b)))
+    h2h = _df.iloc[rows if rows is not None else []]   #h2h df enfrentamiento de equipos
+    if h2h.empty:
+        return h2h
+
+    if "schedule_date" in h2h.columns:
+        h2h = h2h.sort_values("schedule_date")
     else:
-        df["Phase"] = "Regular"
+        h2h = h2h.sort_values(["season", "week"])
+
+    margin = h2h["margin_home"].to_numpy(dtype="float64", na_value=np.nan)
+    winner = pd.Categorical(
+        np.select(
+            [margin > 0, margin < 0],
+            [h2h["team_home"].to_numpy(), h2h["team_away"].to_numpy()],
+            default="Tie"
+        ),
+        categories=[team_a, team_b, "Tie"]
+    )
+    return h2h.assign(winner=winner)
 
-    df["stadium"] = df.get("stadium", "Unknown").fillna("Unknown")
-    df["team_home"] = df["team_home"].astype(str)
-    df["team_away"] = df["team_away"].astype(str)
+AGG_EXPRS = {
+    "Games": pl.col("total_points").count(),
+    "AvgTotalPoints": pl.col("total_points").mean(),
+}
 
-    return df
+@st.cache_data
+def agg_polars(_pl_df, col, kpi_col):
+    # Solo se calcula el KPI que se va a graficar.
+    # "YYYY-MM" ordena cronológicamente como texto, así que sort(col) basta
+    return (
+        _pl_df.drop_nulls(col)
+        .group_by(col)
+        .agg(AGG_EXPRS[kpi_col].alias(kpi_col))
+        .sort(col)
+        .to_pandas()
+    )
 
-df = load_data()
+df, season_cum, pl_games = load_data()
 
 # ---------------- KPI INTERACTIVO ----------------
 st.header("📊 KPI Interactivo")
@@ -126,7 +271,11 @@ with kpi_col1:
         max_value=season_max,
         value=(season_min, season_max)
     )
-    df_kpi = df[df["season"].between(rango_temp[0], rango_temp[1])]
+    # season_cum está ordenado por temporada: dos búsquedas binarias dan el rango
+    seasons = season_cum.index.to_numpy()
+    lo_i = np.searchsorted(seasons, rango_temp[0], side="left")
+    hi_i = np.searchsorted(seasons, rango_temp[1], side="right")
+    totals = season_cum.iloc[hi_i - 1] - (season_cum.iloc[lo_i - 1] if lo_i else 0)
 
 with kpi_col2:
     kpi_option = st.selectbox(
@@ -134,23 +283,24 @@ with kpi_col2:
         ["Total Games", "Avg Total Points/Game", "Home Win Rate", "Close Games (±3 pts)"]
     )
 
-if df_kpi.empty:
+if totals["games"] == 0:
     st.warning("No hay partidos en el rango de temporadas seleccionado.")
 else:
     if kpi_option == "Total Games":
-        val = len(df_kpi)
+        val = int(totals["games"])
         texto = f"{val:,}"
         desc = "Número de partidos en el rango seleccionado."
     elif kpi_option == "Avg Total Points/Game":
-        val = df_kpi["total_points"].mean()
+        # Partidos sin marcador (aún no jugados) no cuentan para el promedio
+        val = totals["pts"] / totals["scored"]
         texto = f"{val:.1f}"
         desc = "Promedio de puntos totales por partido."
     elif kpi_option == "Home Win Rate":
-        val = (df_kpi["margin_home"] > 0).mean() * 100
+        val = totals["hw"] / totals["games"] * 100
         texto = f"{val:.1f}%"
         desc = "Porcentaje de victorias del local."
     else:
-        val = (df_kpi["margin_home"].abs() <= 3).mean() * 100
+        val = totals["cg"] / totals["games"] * 100
         texto = f"{val:.1f}%"
         desc = "Porcentaje de partidos decididos por 3 puntos o menos."
 
@@ -175,7 +325,7 @@ with tab1:
         unsafe_allow_html=True
     )
 
-    teams = sorted(pd.unique(pd.concat([df["team_home"], df["team_away"]], ignore_index=True)))
+    teams = get_teams(df)
 
     c1, c2 = st.columns(2)
     with c1:
@@ -186,29 +336,15 @@ with tab1:
     if team_a == team_b:
         st.info("Selecciona dos equipos diferentes.")
     else:
-        mask = (
-            ((df["team_home"] == team_a) & (df["team_away"] == team_b)) |
-            ((df["team_home"] == team_b) & (df["team_away"] == team_a))
-        )
-        h2h = df[mask].copy()   #h2h df enfrentamiento de equipos
+        h2h = h2h_games(df, team_a, team_b)
 
         if h2h.empty:
             st.warning(f"No hay partidos entre {team_a} y {team_b}.")
         else:
-            if "schedule_date" in h2h.columns:
-                h2h = h2h.sort_values("schedule_date")
-            else:
-                h2h = h2h.sort_values(["season", "week"])
-
-            h2h["winner"] = np.where(
-                h2h["margin_home"] > 0, h2h["team_home"],
-                np.where(h2h["margin_home"] < 0, h2h["team_away"], "Tie")
-            )
-
-            games = len(h2h)
-            wins_a = (h2h["winner"] == team_a).sum()
-            wins_b = (h2h["winner"] == team_b).sum()
-            ties = (h2h["winner"] == "Tie").sum()
+            # Códigos de winner: 0 = team_a, 1 = team_b, 2 = Tie
+            counts = np.bincount(h2h["winner"].cat.codes, minlength=3)
+            wins_a, wins_b, ties = (int(n) for n in counts)
+            games = int(counts.sum())
             avg_pts = h2h["total_points"].mean()
 
             st.subheader(f"Historial {team_a} vs {team_b}")
@@ -225,7 +361,12 @@ with tab1:
                      "score_away", "team_away", "total_points", "Phase", "winner"]
 
             st.markdown("#### Detalle de partidos")
-            st.dataframe(h2h[cols], use_container_width=True)
+            # NO_UPDATE: la tabla es de solo lectura y no dispara reruns
+            AgGrid(
+                h2h[cols],
+                update_mode=GridUpdateMode.NO_UPDATE,
+                key=f"h2h-{team_a}-{team_b}"
+            )
 
 # ===== TAB 2: PERFORMANCE OVER TIME =====
 with tab2:
@@ -245,14 +386,13 @@ with tab2:
             key="time_kpi"
         )
 
-    df_time = df.groupby(tgrp).agg(
-        Games=("total_points", "count"),
-        AvgTotalPoints=("total_points", "mean")
-    ).reset_index()
-
     y_col = "Games" if metric == "Games" else "AvgTotalPoints"
 
-    fig = px.line(df_time, x=tgrp, y=y_col, title=f"{metric} por {tgrp}", markers=True)
+    df_time = agg_polars(pl_games, tgrp, y_col)
+
+    # Scattergl dibuja con WebGL: el costo no crece con la longitud de la línea
+    fig = go.Figure(go.Scattergl(x=df_time[tgrp], y=df_time[y_col], mode="lines+markers"))
+    fig.update_layout(title=f"{metric} por {tgrp}", xaxis_title=tgrp, yaxis_title=y_col)
     st.plotly_chart(fig, use_container_width=True)
 
 # ===== TAB 3: STADIUM ANALYSIS =====
@@ -271,11 +411,7 @@ with tab3:
 
     kpi_col = "Games" if stat_label == "Games" else "AvgTotalPoints"
 
-    df_geo = df.groupby("stadium").agg(
-        Games=("total_points", "count"),
-        AvgTotalPoints=("total_points", "mean")
-    ).reset_index()
-
+    df_geo = agg_polars(pl_games, "stadium", kpi_col)
     df_geo = df_geo.sort_values(kpi_col, ascending=False).head(20)
 
     fig2 = px.bar(
@@ -0,0 +1,9 @@
+import polars as pl
+
+# Genera NFL_scores.parquet, que load_data() usa mientras no sea más viejo que
+# el CSV. Volver a correrlo cada vez que se actualice NFL_scores.csv.
+# Las fechas se guardan ya parseadas para no tener que leerlas en cada arranque.
+df = pl.read_csv("NFL_scores.csv", schema_overrides={"week": pl.Utf8})
+df = df.with_columns(pl.col("schedule_date").str.to_date("%m/%d/%Y", strict=False))
+df.write_parquet("NFL_scores.parquet", compression="zstd")
+print(f"NFL_scores.parquet: {df.height} filas, {df.width} columnas")